@@ -0,0 +1,102 @@
+"""
+Compiled colorspace conversion kernels
+
+Optional Numba implementations of the per-frame conversions in
+colorspace.py. Each kernel walks the image once, row-parallel, and
+writes straight into a preallocated output array. When Numba is not
+installed HAVE_NUMBA is False and colorspace.py uses NumPy instead.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+HAVE_NUMBA = njit is not None
+
+
+if HAVE_NUMBA:
+
+    @njit(inline='always')
+    def _clip(value):
+        return min(max(value, 0), 255)
+
+    @njit(inline='always')
+    def _luma(rgb, row, col, coeffs, bias, bits):
+        """Fixed-point BT.601 luma of one pixel"""
+        r = np.int32(rgb[row, col, 0])
+        g = np.int32(rgb[row, col, 1])
+        b = np.int32(rgb[row, col, 2])
+        y = coeffs[0, 0] * r + coeffs[0, 1] * g + coeffs[0, 2] * b + bias[0]
+        return _clip(y >> bits)
+
+    @njit(inline='always')
+    def _chroma(r, g, b, count, shift, coeffs, bias, bits):
+        """
+        Fixed-point BT.601 U and V from RGB summed over `count` pixels
+
+        The transform is linear, so converting the summed RGB and dividing
+        by the pixel count (2**shift) gives the mean chroma of the block
+        with a single rounding step.
+        """
+        u = coeffs[1, 0] * r + coeffs[1, 1] * g + coeffs[1, 2] * b + bias[1] * count
+        v = coeffs[2, 0] * r + coeffs[2, 1] * g + coeffs[2, 2] * b + bias[2] * count
+        return _clip(u >> (bits + shift)), _clip(v >> (bits + shift))
+
+    @njit(parallel=True, cache=True)
+    def rgb_to_yuv422(rgb, out, coeffs, bias, bits, y_pos, u_pos, v_pos):
+        """
+        Convert RGB24 (height, width, 3) to packed 4:2:2 (height, width*2)
+
+        y_pos, u_pos and v_pos are the byte offsets of Y0, U and V within
+        each 4-byte group; Y1 sits two bytes after Y0. (1, 0, 2) gives
+        UYVY, (0, 1, 3) gives YUYV. coeffs/bias are the BT.601 tables from
+        colorspace.py with `bits` fractional bits.
+        """
+        height, width = rgb.shape[0], rgb.shape[1]
+        for row in prange(height):
+            for col in range(0, width, 2):
+                r = np.int32(rgb[row, col, 0]) + np.int32(rgb[row, col + 1, 0])
+                g = np.int32(rgb[row, col, 1]) + np.int32(rgb[row, col + 1, 1])
+                b = np.int32(rgb[row, col, 2]) + np.int32(rgb[row, col + 1, 2])
+                u, v = _chroma(r, g, b, 2, 1, coeffs, bias, bits)
+                base = 2 * col
+                y0 = _luma(rgb, row, col, coeffs, bias, bits)
+                y1 = _luma(rgb, row, col + 1, coeffs, bias, bits)
+                out[row, base + y_pos] = y0
+                out[row, base + y_pos + 2] = y1
+                out[row, base + u_pos] = u
+                out[row, base + v_pos] = v
+
+    @njit(parallel=True, cache=True)
+    def rgb_to_yuv420p(rgb, out, coeffs, bias, bits):
+        """
+        Convert RGB24 (height, width, 3) to flat planar YUV420P
+
+        out is one buffer of height*width*3/2 bytes: the Y plane followed
+        by the quarter-size U and V planes.
+        """
+        height, width = rgb.shape[0], rgb.shape[1]
+        u_base = height * width
+        v_base = u_base + (height // 2) * (width // 2)
+        for pair in prange(height // 2):
+            row = 2 * pair
+            for col in range(0, width, 2):
+                r = np.int32(0)
+                g = np.int32(0)
+                b = np.int32(0)
+                for dy in range(2):
+                    for dx in range(2):
+                        out[(row + dy) * width + col + dx] = _luma(
+                            rgb, row + dy, col + dx, coeffs, bias, bits
+                        )
+                        r += rgb[row + dy, col + dx, 0]
+                        g += rgb[row + dy, col + dx, 1]
+                        b += rgb[row + dy, col + dx, 2]
+                u, v = _chroma(r, g, b, 4, 2, coeffs, bias, bits)
+                index = pair * (width // 2) + col // 2
+                out[u_base + index] = u
+                out[v_base + index] = v
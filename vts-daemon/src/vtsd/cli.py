@@ -9,8 +9,8 @@ import socket
 import struct
 import sys
 from pathlib import Path
+from typing import BinaryIO
 
-import numpy as np
 from PIL import Image
 
 from .formats import VideoFormat, ColorSpace
@@ -26,6 +26,25 @@ def setup_logging(verbose: bool = False):
     )
 
 
+def setup_event_loop(loop: str = 'auto'):
+    """Select the asyncio event loop implementation (uvloop when available)"""
+    logger = logging.getLogger(__name__)
+    
+    if loop == 'asyncio':
+        return
+    
+    try:
+        import uvloop
+    except ImportError:
+        if loop == 'uvloop':
+            raise SystemExit("uvloop requested but not installed")
+        logger.debug("uvloop not installed, using default asyncio event loop")
+        return
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.debug("Using uvloop event loop")
+
+
 def main_daemon():
     """Entry point for vts-daemon command"""
     parser = argparse.ArgumentParser(
@@ -67,6 +86,12 @@ Examples:
         default='rgb24',
         help='Default colorspace (default: rgb24)'
     )
+    parser.add_argument(
+        '--loop',
+        choices=['auto', 'asyncio', 'uvloop'],
+        default='auto',
+        help='Event loop implementation (default: auto, uvloop if installed)'
+    )
     parser.add_argument(
         '--media', 
         type=Path,
@@ -82,6 +107,7 @@ Examples:
     args = parser.parse_args()
     
     setup_logging(args.verbose)
+    setup_event_loop(args.loop)
     
     # Build format
     colorspace = ColorSpace[args.colorspace.upper()]
@@ -162,25 +188,24 @@ def main_test_client():
     run_test_client(args)
 
 
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    """Receive exactly n bytes"""
-    data = b''
-    while len(data) < n:
-        chunk = sock.recv(n - len(data))
-        if not chunk:
+def recv_exact(rfile: BinaryIO, n: int) -> bytearray:
+    """Receive exactly n bytes into a single preallocated buffer"""
+    data = bytearray(n)
+    view = memoryview(data)
+    received = 0
+    while received < n:
+        count = rfile.readinto(view[received:])
+        if not count:
             raise ConnectionError("Connection closed")
-        data += chunk
+        received += count
     return data
 
 
-def recv_line(sock: socket.socket) -> str:
+def recv_line(rfile: BinaryIO) -> str:
     """Receive a line of text"""
-    data = b''
-    while not data.endswith(b'\n'):
-        chunk = sock.recv(1)
-        if not chunk:
-            raise ConnectionError("Connection closed")
-        data += chunk
+    data = rfile.readline()
+    if not data.endswith(b'\n'):
+        raise ConnectionError("Connection closed")
     return data.decode('utf-8').strip()
 
 
@@ -195,23 +220,27 @@ def run_test_client(args):
         width, height = 720, 576
     
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    rfile = None
     
     try:
         logger.info(f"Connecting to {args.host}:{args.port}")
         sock.connect((args.host, args.port))
+        # Commands are tiny; don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        rfile = sock.makefile('rb', buffering=65536)
         
         # Read hello
-        response = recv_line(sock)
+        response = recv_line(rfile)
         logger.info(f"Server: {response}")
         
         # Set format
         sock.sendall(f"FORMAT {args.format.upper()} RGB24\n".encode())
-        response = recv_line(sock)
+        response = recv_line(rfile)
         logger.info(f"Format: {response}")
         
         # Load file
         sock.sendall(f"LOAD {args.video_file}\n".encode())
-        response = recv_line(sock)
+        response = recv_line(rfile)
         logger.info(f"Load: {response}")
         
         if not response.startswith("OK"):
@@ -220,7 +249,7 @@ def run_test_client(args):
         
         # Get status
         sock.sendall(b"STATUS\n")
-        response = recv_line(sock)
+        response = recv_line(rfile)
         logger.info(f"Status: {response}")
         
         # Capture frames
@@ -229,7 +258,7 @@ def run_test_client(args):
         for i in range(args.frames):
             frame_num = args.start + i
             sock.sendall(f"GETFRAME {frame_num}\n".encode())
-            response = recv_line(sock)
+            response = recv_line(rfile)
             
             if not response.startswith("OK FRAMEDATA"):
                 logger.error(f"Frame {frame_num} failed: {response}")
@@ -239,25 +268,24 @@ def run_test_client(args):
             frame_size = int(response.split()[-1])
             
             # Receive header
-            header_data = recv_exact(sock, FrameHeader.SIZE)
+            header_data = recv_exact(rfile, FrameHeader.SIZE)
             header = FrameHeader.unpack(header_data)
             
             # Receive frame data
-            frame_data = recv_exact(sock, frame_size)
-            
-            # Convert to image
-            frame = np.frombuffer(frame_data, dtype=np.uint8)
-            frame = frame.reshape((header.height, header.width, 3))
+            frame_data = recv_exact(rfile, frame_size)
             
-            # Save
-            img = Image.fromarray(frame)
+            # Build the image straight from the RGB24 payload, without a
+            # round-trip through NumPy (PIL still copies 'RGB' data), and save
+            img = Image.frombuffer(
+                'RGB', (header.width, header.height), frame_data, 'raw', 'RGB', 0, 1
+            )
             filename = args.output.format(frame_num)
             img.save(filename)
             logger.info(f"Saved: {filename} ({header.width}x{header.height})")
         
         # Disconnect
         sock.sendall(b"BYE\n")
-        response = recv_line(sock)
+        response = recv_line(rfile)
         logger.debug(f"Bye: {response}")
         
         logger.info("Done!")
@@ -269,6 +297,8 @@ def run_test_client(args):
         logger.error(f"Error: {e}")
         sys.exit(1)
     finally:
+        if rfile:
+            rfile.close()
         sock.close()
 
 
@@ -2,12 +2,18 @@
 Colorspace conversion utilities
 
 Provides efficient conversion between RGB and YUV colorspaces
-using NumPy for performance.
+using NumPy for performance. The hottest conversions use compiled
+kernels from _kernels when Numba is installed.
 """
 
+import math
+from typing import Optional
+
 import numpy as np
 from numpy.typing import NDArray
 
+from . import _kernels
+
 
 # BT.601 conversion coefficients (standard definition video)
 # These match what the Video Toaster would have used
@@ -15,6 +21,65 @@ BT601_KR = 0.299
 BT601_KG = 0.587
 BT601_KB = 0.114
 
+# The same BT.601 transform in Q15 fixed point (coefficients scaled by
+# 2**15, products accumulated in int32). Rows give Y, U, V as weights of
+# (R, G, B), rounded so the Y row sums to exactly 1.0 and the U and V rows
+# to zero, keeping greys neutral. The bias adds the chroma offset of 128
+# and rounds to nearest.
+BT601_FRAC_BITS = 15
+BT601_Q15 = (
+    (9798, 19235, 3735),
+    (-5529, -10855, 16384),
+    (16384, -13720, -2664),
+)
+_HALF = 1 << (BT601_FRAC_BITS - 1)
+_CHROMA_OFFSET = 128 << BT601_FRAC_BITS
+BT601_Q15_BIAS = (_HALF, _CHROMA_OFFSET + _HALF, _CHROMA_OFFSET + _HALF)
+
+# Inverse BT.601 in Q15: R = Y + RV*V', G = Y - GU*U' - GV*V', B = Y + BU*U'
+# with U' = U - 128 and V' = V - 128
+BT601_INV_Q15_RV = 45941   # 2 * (1 - KR)
+BT601_INV_Q15_GU = 11277   # 2 * (1 - KB) * KB / KG
+BT601_INV_Q15_GV = 23401   # 2 * (1 - KR) * KR / KG
+BT601_INV_Q15_BU = 58065   # 2 * (1 - KB)
+
+# Array copies of the Q15 tables for the compiled kernels
+_BT601_Q15_ARRAY = np.array(BT601_Q15, dtype=np.int32)
+_BT601_Q15_BIAS_ARRAY = np.array(BT601_Q15_BIAS, dtype=np.int32)
+
+# Writable byte buffers the conversions can write into
+OutputBuffer = NDArray[np.uint8] | bytearray | memoryview
+
+
+def _output_array(out: Optional[OutputBuffer], shape: tuple[int, ...]) -> NDArray[np.uint8]:
+    """Allocate an output array, or view a caller-provided buffer as one"""
+    if out is None:
+        return np.empty(shape, dtype=np.uint8)
+    
+    size = math.prod(shape)
+    array = np.frombuffer(out, dtype=np.uint8)
+    if array.size != size:
+        raise ValueError(f"Output buffer must be {size} bytes, got {array.size}")
+    return array.reshape(shape)
+
+
+def _q15_plane(r: NDArray, g: NDArray, b: NDArray, plane: int, shift: int = 0) -> NDArray:
+    """
+    Apply one row of the Q15 BT.601 transform to int32 R, G, B arrays
+    
+    The inputs may hold sums of 2**shift pixels; the result is then the
+    converted mean of each block, rounded once. Returns a clipped int32
+    array.
+    """
+    (kr, kg, kb), bias = BT601_Q15[plane], BT601_Q15_BIAS[plane]
+    acc = kr * r
+    acc += kg * g
+    acc += kb * b
+    acc += bias << shift
+    acc >>= BT601_FRAC_BITS + shift
+    np.clip(acc, 0, 255, out=acc)
+    return acc
+
 
 def rgb24_to_yuv444(rgb: NDArray[np.uint8]) -> tuple[NDArray, NDArray, NDArray]:
     """
@@ -26,25 +91,37 @@ def rgb24_to_yuv444(rgb: NDArray[np.uint8]) -> tuple[NDArray, NDArray, NDArray]:
     Returns:
         Tuple of (Y, U, V) arrays, each shape (height, width), dtype uint8
     """
-    # Convert to float for precision
-    r = rgb[:, :, 0].astype(np.float32)
-    g = rgb[:, :, 1].astype(np.float32)
-    b = rgb[:, :, 2].astype(np.float32)
-    
-    # BT.601 conversion
-    y = BT601_KR * r + BT601_KG * g + BT601_KB * b
-    u = (b - y) / (2 * (1 - BT601_KB)) + 128
-    v = (r - y) / (2 * (1 - BT601_KR)) + 128
-    
-    # Clip and convert back to uint8
-    y = np.clip(y, 0, 255).astype(np.uint8)
-    u = np.clip(u, 0, 255).astype(np.uint8)
-    v = np.clip(v, 0, 255).astype(np.uint8)
+    # Widen to int32 for the fixed-point products
+    r = rgb[:, :, 0].astype(np.int32)
+    g = rgb[:, :, 1].astype(np.int32)
+    b = rgb[:, :, 2].astype(np.int32)
     
+    # BT.601 conversion, one accumulator per plane updated in place
+    y, u, v = (_q15_plane(r, g, b, plane).astype(np.uint8) for plane in range(3))
     return y, u, v
 
 
-def rgb24_to_yuv422_uyvy(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
+def _yuv422_planes(rgb: NDArray[np.uint8]) -> tuple[NDArray, NDArray, NDArray]:
+    """
+    Y at full resolution, U and V subsampled horizontally
+    
+    Chroma is converted from the RGB sum of each horizontal pixel pair,
+    the same as the compiled kernels. Returns clipped int32 planes.
+    """
+    r = rgb[:, :, 0].astype(np.int32)
+    g = rgb[:, :, 1].astype(np.int32)
+    b = rgb[:, :, 2].astype(np.int32)
+    y = _q15_plane(r, g, b, 0)
+    
+    r = r[:, 0::2] + r[:, 1::2]
+    g = g[:, 0::2] + g[:, 1::2]
+    b = b[:, 0::2] + b[:, 1::2]
+    return y, _q15_plane(r, g, b, 1, shift=1), _q15_plane(r, g, b, 2, shift=1)
+
+
+def rgb24_to_yuv422_uyvy(
+    rgb: NDArray[np.uint8], out: Optional[OutputBuffer] = None
+) -> NDArray[np.uint8]:
     """
     Convert RGB24 to YUV422 packed (UYVY format)
     
@@ -54,23 +131,29 @@ def rgb24_to_yuv422_uyvy(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
     Args:
         rgb: Input array of shape (height, width, 3), dtype uint8
              Width must be even.
+        out: Optional writable buffer (array, bytearray, memoryview) of
+             height*width*2 bytes to convert into
         
     Returns:
-        Array of shape (height, width*2), dtype uint8
+        Array of shape (height, width*2), dtype uint8, a view of out if given
     """
     height, width = rgb.shape[:2]
     
     if width % 2 != 0:
         raise ValueError(f"Width must be even, got {width}")
     
-    y, u, v = rgb24_to_yuv444(rgb)
+    uyvy = _output_array(out, (height, width * 2))
+    
+    if _kernels.HAVE_NUMBA:
+        _kernels.rgb_to_yuv422(
+            np.ascontiguousarray(rgb), uyvy, _BT601_Q15_ARRAY, _BT601_Q15_BIAS_ARRAY,
+            BT601_FRAC_BITS, 1, 0, 2
+        )
+        return uyvy
     
-    # Subsample U and V horizontally (average adjacent pixels)
-    u_sub = ((u[:, 0::2].astype(np.uint16) + u[:, 1::2].astype(np.uint16)) // 2).astype(np.uint8)
-    v_sub = ((v[:, 0::2].astype(np.uint16) + v[:, 1::2].astype(np.uint16)) // 2).astype(np.uint8)
+    y, u_sub, v_sub = _yuv422_planes(rgb)
     
     # Pack as UYVY
-    uyvy = np.zeros((height, width * 2), dtype=np.uint8)
     uyvy[:, 0::4] = u_sub      # U
     uyvy[:, 1::4] = y[:, 0::2] # Y0
     uyvy[:, 2::4] = v_sub      # V
@@ -79,7 +162,9 @@ def rgb24_to_yuv422_uyvy(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
     return uyvy
 
 
-def rgb24_to_yuv422_yuyv(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
+def rgb24_to_yuv422_yuyv(
+    rgb: NDArray[np.uint8], out: Optional[OutputBuffer] = None
+) -> NDArray[np.uint8]:
     """
     Convert RGB24 to YUV422 packed (YUYV format)
     
@@ -89,23 +174,29 @@ def rgb24_to_yuv422_yuyv(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
     Args:
         rgb: Input array of shape (height, width, 3), dtype uint8
              Width must be even.
+        out: Optional writable buffer (array, bytearray, memoryview) of
+             height*width*2 bytes to convert into
         
     Returns:
-        Array of shape (height, width*2), dtype uint8
+        Array of shape (height, width*2), dtype uint8, a view of out if given
     """
     height, width = rgb.shape[:2]
     
     if width % 2 != 0:
         raise ValueError(f"Width must be even, got {width}")
     
-    y, u, v = rgb24_to_yuv444(rgb)
+    yuyv = _output_array(out, (height, width * 2))
+    
+    if _kernels.HAVE_NUMBA:
+        _kernels.rgb_to_yuv422(
+            np.ascontiguousarray(rgb), yuyv, _BT601_Q15_ARRAY, _BT601_Q15_BIAS_ARRAY,
+            BT601_FRAC_BITS, 0, 1, 3
+        )
+        return yuyv
     
-    # Subsample U and V horizontally
-    u_sub = ((u[:, 0::2].astype(np.uint16) + u[:, 1::2].astype(np.uint16)) // 2).astype(np.uint8)
-    v_sub = ((v[:, 0::2].astype(np.uint16) + v[:, 1::2].astype(np.uint16)) // 2).astype(np.uint8)
+    y, u_sub, v_sub = _yuv422_planes(rgb)
     
     # Pack as YUYV
-    yuyv = np.zeros((height, width * 2), dtype=np.uint8)
     yuyv[:, 0::4] = y[:, 0::2] # Y0
     yuyv[:, 1::4] = u_sub      # U
     yuyv[:, 2::4] = y[:, 1::2] # Y1
@@ -114,7 +205,9 @@ def rgb24_to_yuv422_yuyv(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
     return yuyv
 
 
-def rgb24_to_yuv420p(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
+def rgb24_to_yuv420p(
+    rgb: NDArray[np.uint8], out: Optional[OutputBuffer] = None
+) -> NDArray[np.uint8]:
     """
     Convert RGB24 to YUV420P (planar format)
     
@@ -125,30 +218,51 @@ def rgb24_to_yuv420p(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
     Args:
         rgb: Input array of shape (height, width, 3), dtype uint8
              Width and height must be even.
+        out: Optional writable buffer (array, bytearray, memoryview) of
+             height*width*3/2 bytes to convert into
         
     Returns:
-        Flat array of shape (height * width * 1.5,), dtype uint8
+        Flat array of shape (height * width * 1.5,), dtype uint8, a view
+        of out if given
     """
     height, width = rgb.shape[:2]
     
     if width % 2 != 0 or height % 2 != 0:
         raise ValueError(f"Width and height must be even, got {width}x{height}")
     
-    y, u, v = rgb24_to_yuv444(rgb)
-    
-    # Subsample U and V in both dimensions (2x2 averaging)
-    u_sub = u.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3)).astype(np.uint8)
-    v_sub = v.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3)).astype(np.uint8)
-    
-    # Concatenate planes
-    return np.concatenate([
-        y.flatten(),
-        u_sub.flatten(),
-        v_sub.flatten()
-    ])
+    luma_size = height * width
+    chroma_size = luma_size // 4
+    yuv = _output_array(out, (luma_size + 2 * chroma_size,))
+    
+    if _kernels.HAVE_NUMBA:
+        _kernels.rgb_to_yuv420p(
+            np.ascontiguousarray(rgb), yuv, _BT601_Q15_ARRAY, _BT601_Q15_BIAS_ARRAY,
+            BT601_FRAC_BITS
+        )
+        return yuv
+    
+    # Y plane at full resolution
+    r = rgb[:, :, 0].astype(np.int32)
+    g = rgb[:, :, 1].astype(np.int32)
+    b = rgb[:, :, 2].astype(np.int32)
+    yuv[:luma_size].reshape(height, width)[...] = _q15_plane(r, g, b, 0)
+    
+    # Sum RGB over each 2x2 block and convert the sums directly; the
+    # transform is linear, so this is the mean chroma of the block
+    rows = rgb[0::2].astype(np.int32)
+    rows += rgb[1::2]
+    blocks = rows[:, 0::2] + rows[:, 1::2]
+    r, g, b = blocks[:, :, 0], blocks[:, :, 1], blocks[:, :, 2]
+    yuv[luma_size:luma_size + chroma_size] = _q15_plane(r, g, b, 1, shift=2).ravel()
+    yuv[luma_size + chroma_size:] = _q15_plane(r, g, b, 2, shift=2).ravel()
+    
+    return yuv
 
 
-def yuv422_uyvy_to_rgb24(uyvy: NDArray[np.uint8], height: int, width: int) -> NDArray[np.uint8]:
+def yuv422_uyvy_to_rgb24(
+    uyvy: NDArray[np.uint8], height: int, width: int,
+    out: Optional[OutputBuffer] = None
+) -> NDArray[np.uint8]:
     """
     Convert YUV422 packed (UYVY) back to RGB24
     
@@ -156,40 +270,37 @@ def yuv422_uyvy_to_rgb24(uyvy: NDArray[np.uint8], height: int, width: int) -> ND
         uyvy: Input array from rgb24_to_yuv422_uyvy
         height: Image height
         width: Image width
+        out: Optional writable buffer (array, bytearray, memoryview) of
+             height*width*3 bytes to convert into
         
     Returns:
-        Array of shape (height, width, 3), dtype uint8
+        Array of shape (height, width, 3), dtype uint8, a view of out if given
     """
     uyvy = uyvy.reshape(height, width * 2)
-    
-    # Extract components
-    u = uyvy[:, 0::4].astype(np.float32)
-    y0 = uyvy[:, 1::4].astype(np.float32)
-    v = uyvy[:, 2::4].astype(np.float32)
-    y1 = uyvy[:, 3::4].astype(np.float32)
-    
-    # Expand U and V to full width
-    u_full = np.repeat(u, 2, axis=1)
-    v_full = np.repeat(v, 2, axis=1)
-    
-    # Interleave Y values
-    y_full = np.zeros((height, width), dtype=np.float32)
-    y_full[:, 0::2] = y0
-    y_full[:, 1::2] = y1
-    
-    # Convert to RGB (BT.601 inverse)
-    u_full -= 128
-    v_full -= 128
-    
-    r = y_full + 1.402 * v_full
-    g = y_full - 0.344136 * u_full - 0.714136 * v_full
-    b = y_full + 1.772 * u_full
-    
-    # Clip and combine
-    rgb = np.stack([
-        np.clip(r, 0, 255).astype(np.uint8),
-        np.clip(g, 0, 255).astype(np.uint8),
-        np.clip(b, 0, 255).astype(np.uint8),
-    ], axis=2)
+    rgb = _output_array(out, (height, width, 3))
+    
+    # Chroma terms of the BT.601 inverse, once per pixel pair, with the
+    # rounding bias folded in
+    u = uyvy[:, 0::4].astype(np.int32)
+    v = uyvy[:, 2::4].astype(np.int32)
+    u -= 128
+    v -= 128
+    r_term = BT601_INV_Q15_RV * v
+    r_term += _HALF
+    g_term = _HALF - BT601_INV_Q15_GU * u
+    g_term -= BT601_INV_Q15_GV * v
+    b_term = BT601_INV_Q15_BU * u
+    b_term += _HALF
+    
+    # Add them to the first and second luma of each pair and write the
+    # even and odd output columns directly
+    for column, offset in ((0, 1), (1, 3)):
+        y = uyvy[:, offset::4].astype(np.int32)
+        y <<= BT601_FRAC_BITS
+        for channel, term in enumerate((r_term, g_term, b_term)):
+            value = y + term
+            value >>= BT601_FRAC_BITS
+            np.clip(value, 0, 255, out=value)
+            rgb[:, column::2, channel] = value
     
     return rgb
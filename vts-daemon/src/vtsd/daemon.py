@@ -6,6 +6,7 @@ Serves video frames over TCP to clients.
 
 import asyncio
 import logging
+import os
 from pathlib import Path
 from typing import Optional
 
@@ -19,6 +20,22 @@ from .protocol import (
 
 logger = logging.getLogger(__name__)
 
+# Transport write buffer limits, in frames of the current output format
+_WRITE_BUFFER_HIGH_FRAMES = 4
+_WRITE_BUFFER_LOW_FRAMES = 1
+
+# File extensions listed by LIST
+_VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v')
+
+# Fixed replies, encoded once
+_STATIC_REPLIES = {
+    response: f"{response}\n".encode('utf-8')
+    for response in (
+        Response.PLAYING, Response.PAUSED, Response.STOPPED,
+        Response.END, Response.BYE,
+    )
+}
+
 
 class DaemonProtocol(asyncio.Protocol):
     """
@@ -42,71 +59,122 @@ class DaemonProtocol(asyncio.Protocol):
         self.media_root = media_root
         self.name = name
         self.transport: Optional[asyncio.Transport] = None
-        self.buffer = b''
+        self.buffer = bytearray()
         self.peername: str = "unknown"
         self._playback_task: Optional[asyncio.Task] = None
+        self._command_task: Optional[asyncio.Task] = None  # command awaiting a decode
         self._streaming = False  # NEW: streaming mode flag
+        self._batching = False
+        self._pending_writes: list[bytes | memoryview] = []
+        self._pending_size = 0
+        self._write_high = 0
+        self._can_send = True  # False while the transport's write buffer is full
 
     def connection_made(self, transport: asyncio.Transport):
         """Called when client connects"""
         self.transport = transport
         self.peername = str(transport.get_extra_info('peername'))
-        logger.info(f"Connection from {self.peername}")
+        logger.info("Connection from %s", self.peername)
+        self._set_write_buffer_limits()
         self.send_line(f"{Response.HELLO} {self.name} VTSource/0.1.0")
 
     def connection_lost(self, exc: Optional[Exception]):
         """Called when client disconnects"""
-        logger.info(f"Connection closed: {self.peername}")
+        logger.info("Connection closed: %s", self.peername)
         if exc:
-            logger.debug(f"Connection error: {exc}")
+            logger.debug("Connection error: %s", exc)
         # Clean up streaming task
         if self._playback_task:
             self._playback_task.cancel()
             self._playback_task = None
+        if self._command_task:
+            self._command_task.cancel()
+            self._command_task = None
+
+    def pause_writing(self):
+        """Called when the transport's write buffer goes over the high-water mark"""
+        # Stop reading commands until the client has caught up, so frame
+        # requests can't pile up unsent frames in memory
+        self._can_send = False
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        """Called when the transport's write buffer drains to the low-water mark"""
+        self._can_send = True
+        self.transport.resume_reading()
+        self._process_buffer()
 
     def data_received(self, data: bytes):
         """Called when data received from client"""
-        self.buffer += data
-
-        # Process complete lines
-        while b'\n' in self.buffer:
-            line, self.buffer = self.buffer.split(b'\n', 1)
+        self.buffer.extend(data)
+        self._process_buffer()
+
+    def _process_buffer(self):
+        """Execute complete command lines in the receive buffer"""
+        # Replies to all commands received together are flushed in one write
+        self._batching = True
+        start = 0
+        try:
+            # Process complete lines, then drop them from the buffer at once.
+            # Stop early if the client isn't reading (the rest waits for
+            # resume_writing()) or a command is still decoding, so replies
+            # stay in request order.
+            while self._can_send and not self._command_task:
+                end = self.buffer.find(b'\n', start)
+                if end < 0:
+                    break
+                line = bytes(self.buffer[start:end])
+                start = end + 1
+                if self._handle_fast_command(line):
+                    continue
+                try:
+                    command_line = line.decode('utf-8').strip()
+                    if command_line:
+                        self.handle_command(command_line)
+                except UnicodeDecodeError:
+                    self.send_error(ErrorCode.INVALID_ARGUMENT, "Invalid UTF-8")
+        finally:
+            del self.buffer[:start]
+            self._batching = False
+            self._flush()
+    
+    def _handle_fast_command(self, line: bytes) -> bool:
+        """
+        Dispatch the hottest commands straight from the raw line
+        
+        Exact upper-case STATUS, NEXT, PREV, GETFRAME and GETFRAME <n>
+        skip decoding and parse_command(). Anything else returns False
+        and goes through handle_command().
+        """
+        line = line.rstrip(b'\r')
+        handler = self._FAST_HANDLERS.get(line)
+        if handler:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[%s] Command: %s", self.peername, line.decode())
+            handler(self, [])
+            return True
+        
+        if line.startswith(b'GETFRAME '):
             try:
-                command_line = line.decode('utf-8').strip()
-                if command_line:
-                    self.handle_command(command_line)
-            except UnicodeDecodeError:
-                self.send_error(ErrorCode.INVALID_ARGUMENT, "Invalid UTF-8")
+                frame_num = int(line[9:])
+            except ValueError:
+                return False
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[%s] Command: GETFRAME %d", self.peername, frame_num)
+            self._getframe(frame_num)
+            return True
+        
+        return False
     
     def handle_command(self, line: str):
         """Parse and execute a command"""
-        logger.debug(f"[{self.peername}] Command: {line}")
+        logger.debug("[%s] Command: %s", self.peername, line)
         
         cmd, args = parse_command(line)
         
-        handlers = {
-            Command.LOAD: self.cmd_load,
-            Command.PLAY: self.cmd_play,
-            Command.PAUSE: self.cmd_pause,
-            Command.STOP: self.cmd_stop,
-            Command.SEEK: self.cmd_seek,
-            Command.NEXT: self.cmd_next,
-            Command.PREV: self.cmd_prev,
-            Command.GETFRAME: self.cmd_getframe,
-            Command.STATUS: self.cmd_status,
-            Command.INFO: self.cmd_info,
-            Command.SOURCE: self.cmd_source,
-            Command.FRAMEINFO: self.cmd_frameinfo,
-            Command.LOOP: self.cmd_loop,
-            Command.FORMAT: self.cmd_format,
-            Command.LIST: self.cmd_list,
-            Command.BYE: self.cmd_bye,
-            Command.STREAM: self.cmd_stream,  # NEW
-        }
-        
-        handler = handlers.get(cmd)
+        handler = self._HANDLERS.get(cmd)
         if handler:
-            handler(args)
+            handler(self, args)
         else:
             self.send_error(ErrorCode.UNKNOWN_COMMAND, f"Unknown command: {cmd}")
     
@@ -128,7 +196,14 @@ class DaemonProtocol(asyncio.Protocol):
             self.send_error(ErrorCode.FILE_NOT_FOUND, f"File not found: {filepath}")
             return
 
-        if self.source.load(filepath):
+        self._run_command(self._load, filepath)
+    
+    async def _load(self, filepath: Path):
+        """Load a file on a worker thread and report the result"""
+        # Loading indexes the whole file and waits for any decode in
+        # progress, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.source.load, filepath):
             self.send_line(f"{Response.LOADED} {self.source.total_frames} frames")
         else:
             self.send_error(ErrorCode.INTERNAL_ERROR, "Failed to load file")
@@ -139,9 +214,10 @@ class DaemonProtocol(asyncio.Protocol):
 
         try:
             while self.source.state == PlayState.PLAYING:
-                # Send frame if streaming is enabled
-                if self._streaming:
-                    self._send_current_frame()
+                # Send frame if streaming is enabled (skipped while the
+                # client is still receiving earlier frames)
+                if self._streaming and self._can_send:
+                    await self._send_frame()
                 
                 await asyncio.sleep(frame_duration)
                 
@@ -154,7 +230,7 @@ class DaemonProtocol(asyncio.Protocol):
                             self.send_line(f"{Response.LOOPED} 0")
                     else:
                         if self._streaming:
-                            self.send_line(Response.END)
+                            self.send_bytes(_STATIC_REPLIES[Response.END])
                         self.source.state = PlayState.STOPPED
                         break
         except asyncio.CancelledError:
@@ -189,11 +265,11 @@ class DaemonProtocol(asyncio.Protocol):
             self.send_error(ErrorCode.NOT_LOADED, "No file loaded")
             return
         if self.source.state == PlayState.PLAYING:
-            self.send_line(Response.PLAYING)
+            self.send_bytes(_STATIC_REPLIES[Response.PLAYING])
             return
         self.source.state = PlayState.PLAYING
         self._playback_task = asyncio.create_task(self._playback_loop())
-        self.send_line(Response.PLAYING)
+        self.send_bytes(_STATIC_REPLIES[Response.PLAYING])
 
     def cmd_pause(self, args: list[str]):
         """PAUSE - Pause playback"""
@@ -201,7 +277,7 @@ class DaemonProtocol(asyncio.Protocol):
         if self._playback_task:
             self._playback_task.cancel()
             self._playback_task = None
-        self.send_line(Response.PAUSED)
+        self.send_bytes(_STATIC_REPLIES[Response.PAUSED])
 
     def cmd_stop(self, args: list[str]):
         """STOP - Stop playback and return to beginning"""
@@ -210,10 +286,14 @@ class DaemonProtocol(asyncio.Protocol):
             self._playback_task.cancel()
             self._playback_task = None
         self.source.seek(0)
-        self.send_line(Response.STOPPED)
+        self.send_bytes(_STATIC_REPLIES[Response.STOPPED])
 
     def cmd_seek(self, args: list[str]):
         """SEEK <frame> - Seek to frame number"""
+        info = self.source.info
+        if not info:
+            self.send_error(ErrorCode.NOT_LOADED, "No file loaded")
+            return
         if not args:
             self.send_error(ErrorCode.INVALID_ARGUMENT, "SEEK requires frame number")
             return
@@ -225,7 +305,7 @@ class DaemonProtocol(asyncio.Protocol):
             return
 
         if frame < 0:
-            frame = self.source.info.frame_count + frame
+            frame = info.frame_count + frame
 
         if self.source.seek(frame):
             self.send_line(f"{Response.SEEKED} {self.source.current_frame}")
@@ -237,7 +317,7 @@ class DaemonProtocol(asyncio.Protocol):
         if self.source.advance():
             self.send_line(f"OK FRAME {self.source.current_frame}")
         else:
-            self.send_line("OK END")
+            self.send_bytes(_STATIC_REPLIES[Response.END])
     
     def cmd_prev(self, args: list[str]):
         """PREV - Go back one frame"""
@@ -246,39 +326,47 @@ class DaemonProtocol(asyncio.Protocol):
         else:
             self.send_line("OK START")
     
-    def _send_current_frame(self):
-        """Send current frame data (shared by GETFRAME and streaming)"""
-        frame_data = self.source.get_frame()
+    async def _send_frame(self, frame_num: Optional[int] = None):
+        """Send frame data (shared by GETFRAME and streaming)"""
+        # Decoding can take a while; do it on a worker thread so other
+        # connections are served in the meantime
+        loop = asyncio.get_running_loop()
+        sequence, frame_data, fmt = await loop.run_in_executor(
+            None, self.source.read_frame, frame_num
+        )
         
         if frame_data is None:
             return
         
-        # Prepare header
-        fmt = self.source.output_format
-        header = FrameHeader(
-            sequence=self.source.current_frame,
-            timestamp_ms=int(self.source.current_frame * fmt.frame_duration_ms),
-            width=fmt.width,
-            height=fmt.height,
-            colorspace=fmt.colorspace.value,
-            flags=FrameFlags.KEYFRAME,
+        # Send the array's own buffer rather than a tobytes() copy; frames are
+        # never modified after decoding, so the transport may hold on to it.
+        # This only saves the copy on Python 3.12+ and uvloop, whose
+        # writelines() hands the buffers to sendmsg()/writev(); before 3.12
+        # asyncio joins them into one bytes object anyway.
+        if frame_data.flags['C_CONTIGUOUS']:
+            payload = memoryview(frame_data).cast('B')
+        else:
+            payload = frame_data.tobytes()
+
+        # Text response and binary header are joined into one small buffer;
+        # the header fields are packed directly, without a FrameHeader. They
+        # describe the format the frame was converted to, which a FORMAT
+        # command during the decode may have changed since.
+        prefix = f"{Response.FRAMEDATA} {len(payload)}\n".encode('utf-8')
+        head = prefix + FrameHeader.pack_values(
+            sequence,
+            fmt.frame_timestamp_ms(sequence),
+            fmt.width,
+            fmt.height,
+            fmt.colorspace.value,
+            FrameFlags.KEYFRAME,
         )
         
-        frame_bytes = frame_data.tobytes()
-        
-        # Send text response
-        self.send_line(f"{Response.FRAMEDATA} {len(frame_bytes)}")
-        
-        # Send binary header + data
-        self.transport.write(header.pack())
-        self.transport.write(frame_bytes)
+        # ...and go out in one write together with the frame data
+        self._write(head, payload)
     
     def cmd_getframe(self, args: list[str]):
         """GETFRAME [frame] - Get frame data"""
-        if not self.source.is_loaded:
-            self.send_error(ErrorCode.NOT_LOADED, "No file loaded")
-            return
-        
         frame_num = None
         if args:
             try:
@@ -287,10 +375,15 @@ class DaemonProtocol(asyncio.Protocol):
                 self.send_error(ErrorCode.INVALID_ARGUMENT, "Invalid frame number")
                 return
         
-        if frame_num is not None:
-            self.source.seek(frame_num)
+        self._getframe(frame_num)
+    
+    def _getframe(self, frame_num: Optional[int]):
+        """Seek if a frame number is given, then send the current frame"""
+        if not self.source.is_loaded:
+            self.send_error(ErrorCode.NOT_LOADED, "No file loaded")
+            return
         
-        self._send_current_frame()
+        self._run_command(self._send_frame, frame_num)
     
     def cmd_status(self, args: list[str]):
         """STATUS - Get current status"""
@@ -352,7 +445,7 @@ class DaemonProtocol(asyncio.Protocol):
 
         # Get output format info
         fmt = self.source.output_format
-        timestamp_ms = int(frame_num * fmt.frame_duration_ms)
+        timestamp_ms = fmt.frame_timestamp_ms(frame_num)
 
         # Flags
         flags = FrameFlags.KEYFRAME if frame_num == 0 else FrameFlags.NONE
@@ -406,6 +499,7 @@ class DaemonProtocol(asyncio.Protocol):
                           f"Unknown format: {standard}")
             return
         
+        self._set_write_buffer_limits()
         self.send_line(f"OK FORMAT {standard} {colorspace.name}")
     
     def cmd_list(self, args: list[str]):
@@ -421,16 +515,15 @@ class DaemonProtocol(asyncio.Protocol):
                           f"Path not found: {search_path}")
             return
         
-        # Find video files
-        video_extensions = {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v'}
-        files = []
-        
+        # Find video files (DirEntry caches file type, no Path per entry)
         if search_path.is_file():
             files = [search_path.name]
         else:
-            for f in search_path.iterdir():
-                if f.is_file() and f.suffix.lower() in video_extensions:
-                    files.append(f.name)
+            with os.scandir(search_path) as entries:
+                files = [
+                    entry.name for entry in entries
+                    if entry.name.lower().endswith(_VIDEO_EXTENSIONS) and entry.is_file()
+                ]
         
         files.sort()
         self.send_line(f"OK LIST {len(files)}")
@@ -439,20 +532,100 @@ class DaemonProtocol(asyncio.Protocol):
     
     def cmd_bye(self, args: list[str]):
         """BYE - Disconnect"""
-        self.send_line(Response.BYE)
+        self.send_bytes(_STATIC_REPLIES[Response.BYE])
+        self._flush()
         self.transport.close()
     
     # === Helper methods ===
     
+    def _run_command(self, func, *args):
+        """Run a command coroutine function; later commands wait until it completes"""
+        # The coroutine is created inside the task, so cancelling the task
+        # before it starts doesn't leave a coroutine that was never awaited
+        self._command_task = asyncio.create_task(self._await_command(func, *args))
+    
+    async def _await_command(self, func, *args):
+        """Await a command coroutine function, then resume processing buffered commands"""
+        try:
+            await func(*args)
+        except Exception:
+            logger.exception("[%s] Command failed", self.peername)
+        finally:
+            self._command_task = None
+        
+        if self.transport and not self.transport.is_closing():
+            self._process_buffer()
+    
     def send_line(self, message: str):
         """Send a line of text to client"""
+        self._write(f"{message}\n".encode('utf-8'))
+    
+    def send_bytes(self, data: bytes):
+        """Send an already encoded reply to client"""
+        self._write(data)
+    
+    def _write(self, *chunks: bytes | memoryview):
+        """Queue chunks while batching replies, otherwise write them out now"""
+        if self._batching:
+            self._pending_writes.extend(chunks)
+            self._pending_size += sum(len(chunk) for chunk in chunks)
+            # Don't let a long pipeline of frame requests bypass flow control
+            if self._pending_size >= self._write_high:
+                self._flush()
+        elif self.transport and not self.transport.is_closing():
+            self.transport.writelines(chunks)
+    
+    def _flush(self):
+        """Write out all replies queued while batching"""
+        if not self._pending_writes:
+            return
         if self.transport and not self.transport.is_closing():
-            self.transport.write(f"{message}\n".encode('utf-8'))
+            self.transport.writelines(self._pending_writes)
+        self._pending_writes.clear()
+        self._pending_size = 0
+    
+    def _set_write_buffer_limits(self):
+        """Size the transport's write buffer limits to a few output frames"""
+        frame_size = self.source.output_format.frame_size_bytes
+        self._write_high = _WRITE_BUFFER_HIGH_FRAMES * frame_size
+        self.transport.set_write_buffer_limits(
+            high=self._write_high,
+            low=_WRITE_BUFFER_LOW_FRAMES * frame_size,
+        )
     
     def send_error(self, code: ErrorCode, message: str):
         """Send an error response"""
         self.send_line(format_error(code, message))
 
+    # Command dispatch table, built once at class creation
+    _HANDLERS = {
+        Command.LOAD: cmd_load,
+        Command.PLAY: cmd_play,
+        Command.PAUSE: cmd_pause,
+        Command.STOP: cmd_stop,
+        Command.SEEK: cmd_seek,
+        Command.NEXT: cmd_next,
+        Command.PREV: cmd_prev,
+        Command.GETFRAME: cmd_getframe,
+        Command.STATUS: cmd_status,
+        Command.INFO: cmd_info,
+        Command.SOURCE: cmd_source,
+        Command.FRAMEINFO: cmd_frameinfo,
+        Command.LOOP: cmd_loop,
+        Command.FORMAT: cmd_format,
+        Command.LIST: cmd_list,
+        Command.BYE: cmd_bye,
+        Command.STREAM: cmd_stream,
+    }
+    
+    # Argument-less hot commands, matched on the raw line by _handle_fast_command
+    _FAST_HANDLERS = {
+        b'STATUS': cmd_status,
+        b'NEXT': cmd_next,
+        b'PREV': cmd_prev,
+        b'GETFRAME': cmd_getframe,
+    }
+
 
 async def run_daemon(
     host: str = '0.0.0.0',
@@ -484,10 +657,10 @@ async def run_daemon(
     )
     
     addrs = ', '.join(str(sock.getsockname()) for sock in server.sockets)
-    logger.info(f"VTS Daemon '{name}' listening on {addrs}")
-    logger.info(f"Default format: {video_format}")
+    logger.info("VTS Daemon '%s' listening on %s", name, addrs)
+    logger.info("Default format: %s", video_format)
     if media_root:
-        logger.info(f"Media root: {media_root}")
+        logger.info("Media root: %s", media_root)
     
     async with server:
         await server.serve_forever()
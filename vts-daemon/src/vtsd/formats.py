@@ -16,11 +16,15 @@ class ColorSpace(Enum):
     @property
     def bytes_per_pixel(self) -> float:
         """Average bytes per pixel for this colorspace"""
-        return {
-            ColorSpace.RGB24: 3.0,
-            ColorSpace.YUV422: 2.0,
-            ColorSpace.YUV420P: 1.5,
-        }[self]
+        return _BYTES_PER_PIXEL[self]
+
+
+# Average bytes per pixel of each colorspace
+_BYTES_PER_PIXEL = {
+    ColorSpace.RGB24: 3.0,
+    ColorSpace.YUV422: 2.0,
+    ColorSpace.YUV420P: 1.5,
+}
 
 
 class VideoStandard(Enum):
@@ -45,6 +49,27 @@ class VideoFormat:
     pixel_aspect_num: int = 1
     pixel_aspect_den: int = 1
     
+    def __post_init__(self):
+        # The format is immutable, so derived values are computed once here
+        # (frozen dataclass, so bypass __setattr__)
+        frame_rate = self.frame_rate_num / self.frame_rate_den
+        frame_size_bytes = int(self.width * self.height * self.colorspace.bytes_per_pixel)
+        cached = {
+            '_ms_num': self.frame_rate_den * 1000,
+            '_ms_den': self.frame_rate_num,
+            '_frame_rate': frame_rate,
+            '_frame_duration_ms': (self.frame_rate_den / self.frame_rate_num) * 1000,
+            '_frame_duration_us': int((self.frame_rate_den / self.frame_rate_num) * 1_000_000),
+            '_frame_size_bytes': frame_size_bytes,
+            '_data_rate_mbps': (frame_size_bytes * frame_rate * 8) / 1_000_000,
+            '_str': (
+                f"{self.standard.name} {self.width}x{self.height} "
+                f"@ {frame_rate:.2f}fps {self.colorspace.name}"
+            ),
+        }
+        for name, value in cached.items():
+            object.__setattr__(self, name, value)
+    
     @classmethod
     def ntsc(cls, colorspace: ColorSpace = ColorSpace.RGB24) -> 'VideoFormat':
         """
@@ -84,17 +109,21 @@ class VideoFormat:
     @property
     def frame_rate(self) -> float:
         """Frame rate as floating point"""
-        return self.frame_rate_num / self.frame_rate_den
+        return self._frame_rate
     
     @property
     def frame_duration_ms(self) -> float:
         """Duration of one frame in milliseconds"""
-        return (self.frame_rate_den / self.frame_rate_num) * 1000
+        return self._frame_duration_ms
     
     @property
     def frame_duration_us(self) -> int:
         """Duration of one frame in microseconds"""
-        return int((self.frame_rate_den / self.frame_rate_num) * 1_000_000)
+        return self._frame_duration_us
+    
+    def frame_timestamp_ms(self, frame_number: int) -> int:
+        """Timestamp of a frame in whole milliseconds, using exact integer math"""
+        return frame_number * self._ms_num // self._ms_den
     
     @property
     def pixel_aspect_ratio(self) -> float:
@@ -109,19 +138,15 @@ class VideoFormat:
     @property
     def frame_size_bytes(self) -> int:
         """Size of one frame in bytes"""
-        return int(self.width * self.height * self.colorspace.bytes_per_pixel)
+        return self._frame_size_bytes
     
     @property 
     def data_rate_mbps(self) -> float:
         """Uncompressed data rate in megabits per second"""
-        bytes_per_second = self.frame_size_bytes * self.frame_rate
-        return (bytes_per_second * 8) / 1_000_000
+        return self._data_rate_mbps
     
     def __str__(self) -> str:
-        return (
-            f"{self.standard.name} {self.width}x{self.height} "
-            f"@ {self.frame_rate:.2f}fps {self.colorspace.name}"
-        )
+        return self._str
 
 
 # Pre-defined format constants for convenience
@@ -4,10 +4,11 @@ VTS Network Protocol
 Defines the protocol for communication between VTS daemon and clients.
 """
 
+import re
 import struct
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Optional
+from typing import ClassVar, Optional
 
 
 class FrameFlags(IntEnum):
@@ -19,7 +20,11 @@ class FrameFlags(IntEnum):
     END_OF_STREAM = 1 << 3
 
 
-@dataclass
+# Frame header layout, compiled once (big-endian)
+_HEADER_STRUCT = struct.Struct('>IIHHHBB')
+
+
+@dataclass(slots=True, frozen=True)
 class FrameHeader:
     """
     Header prepended to each frame transmission
@@ -41,13 +46,34 @@ class FrameHeader:
     flags: int
     reserved: int = 0
     
-    FORMAT = '>IIHHHBB'  # Big-endian
-    SIZE = struct.calcsize(FORMAT)  # Should be 16 bytes
+    FORMAT: ClassVar[str] = _HEADER_STRUCT.format  # Big-endian
+    SIZE: ClassVar[int] = _HEADER_STRUCT.size  # Should be 16 bytes
+    
+    @staticmethod
+    def pack_values(sequence: int, timestamp_ms: int, width: int, height: int,
+                    colorspace: int, flags: int, reserved: int = 0) -> bytes:
+        """Serialize header fields to bytes without creating a FrameHeader"""
+        return _HEADER_STRUCT.pack(
+            sequence, timestamp_ms, width, height, colorspace, flags, reserved
+        )
     
     def pack(self) -> bytes:
         """Serialize header to bytes"""
-        return struct.pack(
-            self.FORMAT,
+        return _HEADER_STRUCT.pack(
+            self.sequence,
+            self.timestamp_ms,
+            self.width,
+            self.height,
+            self.colorspace,
+            self.flags,
+            self.reserved
+        )
+    
+    def pack_into(self, buffer: bytearray, offset: int = 0) -> None:
+        """Serialize header into an existing buffer at the given offset"""
+        _HEADER_STRUCT.pack_into(
+            buffer,
+            offset,
             self.sequence,
             self.timestamp_ms,
             self.width,
@@ -63,7 +89,7 @@ class FrameHeader:
         if len(data) < cls.SIZE:
             raise ValueError(f"Header requires {cls.SIZE} bytes, got {len(data)}")
         
-        seq, ts, w, h, cs, flags, reserved = struct.unpack(cls.FORMAT, data[:cls.SIZE])
+        seq, ts, w, h, cs, flags, reserved = _HEADER_STRUCT.unpack_from(data)
         return cls(seq, ts, w, h, cs, flags, reserved)
     
     @property
@@ -142,6 +168,11 @@ class ErrorCode(IntEnum):
     NOT_LOADED = 501
 
 
+# One argument: a quoted string (the closing quote may be missing at end
+# of line), or a run of characters up to the next space
+_ARG_RE = re.compile(r'"([^"]*)(?:"|$)|(\S[^ ]*)')
+
+
 def parse_command(line: str) -> tuple[str, list[str]]:
     """
     Parse a command line into command and arguments
@@ -160,31 +191,7 @@ def parse_command(line: str) -> tuple[str, list[str]]:
     
     if len(parts) > 1:
         # Handle quoted arguments for file paths with spaces
-        args = []
-        remainder = parts[1]
-        
-        while remainder:
-            remainder = remainder.lstrip()
-            if not remainder:
-                break
-                
-            if remainder.startswith('"'):
-                # Quoted argument
-                end = remainder.find('"', 1)
-                if end == -1:
-                    args.append(remainder[1:])
-                    break
-                args.append(remainder[1:end])
-                remainder = remainder[end+1:]
-            else:
-                # Unquoted argument
-                space = remainder.find(' ')
-                if space == -1:
-                    args.append(remainder)
-                    break
-                args.append(remainder[:space])
-                remainder = remainder[space+1:]
-        
+        args = [quoted or plain for quoted, plain in _ARG_RE.findall(parts[1])]
         return command, args
     
     return command, []
@@ -5,23 +5,31 @@ Handles loading, decoding, and serving video frames.
 """
 
 import logging
+import math
+import threading
+from bisect import bisect_right
 from dataclasses import dataclass, field
 from enum import Enum, auto
+from fractions import Fraction
 from pathlib import Path
-from typing import Optional
-from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional
 
 import av
 import numpy as np
 from numpy.typing import NDArray
-from PIL import Image
 
 from .formats import VideoFormat, ColorSpace
-from .colorspace import rgb24_to_yuv422_uyvy, rgb24_to_yuv420p
 
 
 logger = logging.getLogger(__name__)
 
+# swscale pixel format for each output colorspace
+_AV_FORMATS = {
+    ColorSpace.RGB24: 'rgb24',
+    ColorSpace.YUV422: 'uyvy422',
+    ColorSpace.YUV420P: 'yuv420p',
+}
+
 
 class PlayState(Enum):
     """Playback state"""
@@ -45,34 +53,41 @@ class VideoInfo:
 
 class FrameCache:
     """
-    LRU cache for decoded frames
+    LRU cache for frames
     
-    Caches recently accessed frames to avoid redundant decoding.
+    Caches recently accessed frames to avoid redundant decoding. Keys are
+    whatever identifies a frame to the caller, e.g. (frame number, format)
+    for converted output. Safe to use from multiple threads.
     """
     
     def __init__(self, max_size: int = 30):
         self.max_size = max_size
-        self._cache: OrderedDict[int, NDArray] = OrderedDict()
+        # Plain dict in LRU order: oldest first, reinsert to mark as used
+        self._cache: dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
     
-    def get(self, frame_number: int) -> Optional[NDArray]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """Get frame from cache, updating LRU order"""
-        if frame_number in self._cache:
-            self._cache.move_to_end(frame_number)
-            return self._cache[frame_number]
-        return None
+        with self._lock:
+            frame = self._cache.pop(key, None)
+            if frame is not None:
+                self._cache[key] = frame
+            return frame
     
-    def put(self, frame_number: int, frame: NDArray):
+    def put(self, key: Hashable, frame: Any):
         """Add frame to cache, evicting oldest if necessary"""
-        if frame_number in self._cache:
-            self._cache.move_to_end(frame_number)
-        else:
-            if len(self._cache) >= self.max_size:
-                self._cache.popitem(last=False)
-            self._cache[frame_number] = frame
+        with self._lock:
+            if key in self._cache:
+                self._cache[key] = self._cache.pop(key)
+            else:
+                if len(self._cache) >= self.max_size:
+                    del self._cache[next(iter(self._cache))]
+                self._cache[key] = frame
     
     def clear(self):
         """Clear all cached frames"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
     
     def __len__(self) -> int:
         return len(self._cache)
@@ -85,16 +100,22 @@ class VideoSource:
     Handles loading, seeking, and frame extraction with format conversion.
     """
     
-    def __init__(self, output_format: VideoFormat, cache_size: int = 30):
+    def __init__(self, output_format: VideoFormat, cache_size: int = 30,
+                 decoded_cache_size: int = 8):
         """
         Initialize video source
         
         Args:
             output_format: Target output format (NTSC/PAL, colorspace)
-            cache_size: Number of frames to cache
+            cache_size: Number of converted frames to cache
+            decoded_cache_size: Number of decoded (unconverted) frames to
+                cache, so a format change only reruns the conversion
         """
         self.output_format = output_format
+        # Converted frames keyed by (frame number, output format), so a
+        # FORMAT change never serves frames in the previous format
         self.cache = FrameCache(max_size=cache_size)
+        self._decoded = FrameCache(max_size=decoded_cache_size)
         
         self._container: Optional[av.container.InputContainer] = None
         self._stream: Optional[av.video.stream.VideoStream] = None
@@ -104,7 +125,28 @@ class VideoSource:
         self._current_frame: int = 0
         self._loop: bool = False
         
-        # Reusable resampler for scaling
+        # Serializes container access. Held for a whole load or decode, so
+        # the daemon only calls load() and read_frame() on worker threads.
+        self._lock = threading.RLock()
+        
+        # Timestamp index built on load: pts of every frame in presentation
+        # order, and (frame number, seek timestamp) of each keyframe. Empty
+        # if the stream has no packet timestamps.
+        self._frame_pts: list[int] = []
+        self._keyframes: list[tuple[int, int]] = []
+        
+        # Frame number to pts as the integer ratio num/den, for seeking
+        # without an index
+        self._pts_num: int = 0
+        self._pts_den: int = 1
+        
+        # Frame generator of the decoder and the frame it yields next; the
+        # decoder is only repositioned when a request can't be reached by
+        # decoding forward
+        self._decoder: Optional[Iterator[av.VideoFrame]] = None
+        self._next_decode: int = 0
+        
+        # Reusable swscale context for scaling and conversion, created on load
         self._resampler: Optional[av.video.reformatter.VideoReformatter] = None
     
     @property
@@ -137,7 +179,7 @@ class VideoSource:
     
     @property
     def is_loaded(self) -> bool:
-        return self._container is not None
+        return self._info is not None
 
     @property
     def frame_duration_ms(self) -> float:
@@ -147,180 +189,313 @@ class VideoSource:
         """
         Load a video file
         
+        The file is opened and indexed before anything is replaced, so
+        other threads see either the previous file or the new one, never a
+        half-loaded source.
+        
         Args:
             filepath: Path to video file
             
         Returns:
             True if successful, False otherwise
         """
+        container = None
         try:
-            self.close()
+            container = av.open(str(filepath))
+            stream = container.streams.video[0]
             
-            self._container = av.open(str(filepath))
-            self._stream = self._container.streams.video[0]
+            # Index frame timestamps for exact seeking
+            frame_pts, keyframes = self._build_index(container, stream)
             
             # Calculate frame count
-            if self._stream.frames and self._stream.frames > 0:
-                frame_count = self._stream.frames
-            elif self._stream.duration:
-                duration = float(self._stream.duration * self._stream.time_base)
-                fps = float(self._stream.average_rate or self._stream.base_rate or 30)
+            if frame_pts:
+                frame_count = len(frame_pts)
+            elif stream.frames and stream.frames > 0:
+                frame_count = stream.frames
+            elif stream.duration:
+                duration = float(stream.duration * stream.time_base)
+                fps = float(stream.average_rate or stream.base_rate or 30)
                 frame_count = int(duration * fps)
             else:
                 # Last resort: scan the file
-                frame_count = self._count_frames()
+                frame_count = self._count_frames(container)
             
             # Build video info
-            self._info = VideoInfo(
+            info = VideoInfo(
                 filepath=filepath,
-                width=self._stream.width,
-                height=self._stream.height,
+                width=stream.width,
+                height=stream.height,
                 frame_count=frame_count,
-                frame_rate=float(self._stream.average_rate or 30),
-                duration_seconds=frame_count / float(self._stream.average_rate or 30),
-                codec=self._stream.codec_context.name,
-                pixel_format=self._stream.pix_fmt or "unknown",
+                frame_rate=float(stream.average_rate or 30),
+                duration_seconds=frame_count / float(stream.average_rate or 30),
+                codec=stream.codec_context.name,
+                pixel_format=stream.pix_fmt or "unknown",
             )
             
-            self._current_frame = 0
-            self._state = PlayState.STOPPED
-            self.cache.clear()
-            
-            logger.info(f"Loaded: {filepath} ({frame_count} frames, "
-                       f"{self._info.width}x{self._info.height})")
-            return True
+            # pts per frame = 1 / (rate * time_base)
+            rate = Fraction(stream.average_rate or 30)
+            time_base = Fraction(stream.time_base)
             
         except Exception as e:
             logger.error(f"Failed to load {filepath}: {e}")
+            if container:
+                container.close()
             self.close()
             return False
+        
+        with self._lock:
+            self.close()
+            self._container = container
+            self._stream = stream
+            self._resampler = av.video.reformatter.VideoReformatter()
+            self._frame_pts = frame_pts
+            self._keyframes = keyframes
+            self._pts_num = rate.denominator * time_base.denominator
+            self._pts_den = rate.numerator * time_base.numerator
+            # Last: the source counts as loaded once this is set
+            self._info = info
+        
+        logger.info(f"Loaded: {filepath} ({frame_count} frames, "
+                   f"{info.width}x{info.height})")
+        return True
     
-    def _count_frames(self) -> int:
+    @staticmethod
+    def _build_index(
+        container: av.container.InputContainer, stream: av.video.stream.VideoStream
+    ) -> tuple[list[int], list[tuple[int, int]]]:
+        """
+        Index frame timestamps by demuxing the video stream once
+        
+        Only packets are read; nothing is decoded. Keyframes are sought by
+        their dts: it is never later than the pts, so a backward seek can't
+        land past the keyframe (seeking MPEG-TS by pts lands on the next one).
+        
+        Returns:
+            Tuple of (pts of every frame in presentation order, list of
+            (frame number, seek timestamp) per keyframe), or two empty lists
+            if any packet has no timestamp
+        """
+        packets = []
+        for packet in container.demux(stream):
+            if packet.size == 0:
+                # Flush packet at end of stream
+                continue
+            if packet.pts is None:
+                return [], []
+            seek_ts = packet.dts if packet.dts is not None else packet.pts
+            packets.append((packet.pts, packet.is_keyframe, seek_ts))
+        
+        packets.sort()
+        frame_pts = [pts for pts, _, _ in packets]
+        keyframes = [
+            (n, seek_ts) for n, (_, keyframe, seek_ts) in enumerate(packets) if keyframe
+        ]
+        return frame_pts, keyframes
+    
+    @staticmethod
+    def _count_frames(container: av.container.InputContainer) -> int:
         """Count frames by decoding (slow, last resort)"""
+        # Indexing may have stopped part way through the file
+        container.seek(0)
         count = 0
-        for _ in self._container.decode(video=0):
+        for _ in container.decode(video=0):
             count += 1
         # Reset container
-        self._container.seek(0)
+        container.seek(0)
         return count
     
     def close(self):
         """Close current video file and release resources"""
-        if self._container:
-            self._container.close()
-        self._container = None
-        self._stream = None
-        self._info = None
-        self._resampler = None
-        self._state = PlayState.STOPPED
-        self._current_frame = 0
-        self.cache.clear()
+        with self._lock:
+            # First: the source no longer counts as loaded
+            self._info = None
+            if self._container:
+                self._container.close()
+            self._container = None
+            self._stream = None
+            self._resampler = None
+            self._state = PlayState.STOPPED
+            self._current_frame = 0
+            self._frame_pts = []
+            self._keyframes = []
+            self._decoder = None
+            self.cache.clear()
+            self._decoded.clear()
     
     def seek(self, frame_number: int) -> bool:
         """
         Seek to specific frame
         
+        Only moves the current frame; the decoder is repositioned when the
+        frame is next requested from get_frame. Doesn't take the source
+        lock, so it never waits for a decode.
+        
         Args:
             frame_number: Target frame number
             
         Returns:
             True if successful
         """
-        if not self._container or not self._info:
+        info = self._info
+        if not self._container or not info:
             return False
         
-        frame_number = max(0, min(frame_number, self._info.frame_count - 1))
+        self._current_frame = max(0, min(frame_number, info.frame_count - 1))
+        return True
+    
+    def _decode_frame(self, frame_number: int) -> Optional[av.VideoFrame]:
+        """
+        Decode a frame, repositioning the decoder first if needed
         
-        try:
-            # Convert frame number to timestamp
-            time_base = self._stream.time_base
-            fps = self._info.frame_rate
-            target_pts = int(frame_number / fps / float(time_base))
-            
-            self._container.seek(target_pts, stream=self._stream)
-            self._current_frame = frame_number
-            return True
-            
-        except Exception as e:
-            logger.error(f"Seek to frame {frame_number} failed: {e}")
-            return False
+        With a timestamp index, the decoder seeks to the last keyframe at
+        or before the frame and decodes forward, discarding frames until
+        it reaches the frame's pts. Requests further on in the same GOP
+        just continue decoding. Without keyframes in the index, it seeks
+        by time instead and lets the demuxer find the keyframe.
+        """
+        target_pts = self._frame_pts[frame_number] if self._frame_pts else None
+        if not self._keyframes:
+            # Seek by time; without an index, take the next decoded frame
+            if self._decoder is None or frame_number != self._next_decode:
+                seek_pts = target_pts
+                if seek_pts is None:
+                    seek_pts = frame_number * self._pts_num // self._pts_den
+                self._container.seek(seek_pts, stream=self._stream)
+                self._decoder = self._container.decode(self._stream)
+        else:
+            index = bisect_right(self._keyframes, (frame_number, math.inf)) - 1
+            keyframe, seek_ts = self._keyframes[max(index, 0)]
+            if (self._decoder is None or frame_number < self._next_decode
+                    or keyframe > self._next_decode):
+                self._container.seek(seek_ts, stream=self._stream)
+                self._decoder = self._container.decode(self._stream)
+        
+        for frame in self._decoder:
+            if target_pts is not None and frame.pts is not None and frame.pts < target_pts:
+                continue
+            self._next_decode = frame_number + 1
+            return frame
+        
+        # End of stream; reposition on the next request
+        self._decoder = None
+        return None
     
-    def get_frame(self, frame_number: Optional[int] = None) -> Optional[NDArray]:
+    def get_frame(self, frame_number: Optional[int] = None,
+                  fmt: Optional[VideoFormat] = None) -> Optional[NDArray]:
         """
         Get a frame, scaled and converted to output format
         
+        Cached frames are returned without taking the source lock, so
+        clients reading cached frames aren't held up by another client's
+        decode. A miss waits for the lock and checks the cache again, so
+        concurrent requests for the same frame decode it only once.
+        
         Args:
             frame_number: Specific frame to get, or None for current frame
+            fmt: Format to convert to, or None for the current output format
             
         Returns:
             Frame data in output format, or None if unavailable
         """
-        if not self._container:
-            return None
-        
         if frame_number is None:
             frame_number = self._current_frame
         
+        # A FORMAT command may change the output format during the decode;
+        # the frame is converted to and cached under the format read here
+        if fmt is None:
+            fmt = self.output_format
+        key = (frame_number, fmt)
+        
         # Check cache first
-        cached = self.cache.get(frame_number)
+        cached = self.cache.get(key)
         if cached is not None:
             return cached
         
-        # Seek if necessary
-        if frame_number != self._current_frame:
-            if not self.seek(frame_number):
+        with self._lock:
+            if not self._container:
                 return None
-        
-        try:
-            # Decode frames until we get the one we want
-            for frame in self._container.decode(video=0):
-                # Convert to RGB24
-                frame_rgb = frame.to_ndarray(format='rgb24')
-                
-                # Scale to output format
-                scaled = self._scale_frame(frame_rgb)
+            
+            # Another thread may have decoded it while we waited for the lock
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            
+            # Decoded for another output format, only needs converting
+            decoded = self._decoded.get(frame_number)
+            if decoded is not None:
+                output = self._convert_frame(decoded, fmt)
+                self.cache.put(key, output)
+                return output
+            
+            if not 0 <= frame_number < self._info.frame_count:
+                return None
+            
+            try:
+                frame = self._decode_frame(frame_number)
+                if frame is None:
+                    return None
                 
-                # Convert colorspace
-                output = self._convert_colorspace(scaled)
+                # Scale and convert to output format
+                output = self._convert_frame(frame, fmt)
                 
                 # Cache and return
-                self.cache.put(frame_number, output)
-                self._current_frame = frame_number
+                self._decoded.put(frame_number, frame)
+                self.cache.put(key, output)
                 return output
                 
-        except Exception as e:
-            logger.error(f"Frame decode failed: {e}")
-            return None
-        
-        return None
+            except Exception as e:
+                logger.error(f"Frame decode failed: {e}")
+                self._decoder = None
+                return None
     
-    def _scale_frame(self, frame: NDArray) -> NDArray:
-        """Scale frame to output dimensions"""
-        h, w = frame.shape[:2]
-        target_w = self.output_format.width
-        target_h = self.output_format.height
+    def read_frame(
+        self, frame_number: Optional[int] = None
+    ) -> tuple[int, Optional[NDArray], VideoFormat]:
+        """
+        Seek to a frame (if given) and get it along with its frame number
         
-        if w == target_w and h == target_h:
-            return frame
+        get_frame takes the source lock for decoding, so this can be called
+        from a worker thread while other clients use the source.
         
-        # Use PIL for high-quality scaling
-        img = Image.fromarray(frame)
-        img = img.resize((target_w, target_h), Image.Resampling.LANCZOS)
-        return np.array(img)
+        Args:
+            frame_number: Frame to seek to, or None for current frame
+            
+        Returns:
+            Tuple of (frame number, frame data or None, format the frame
+            was converted to)
+        """
+        if frame_number is not None:
+            self.seek(frame_number)
+        frame_number = self._current_frame
+        fmt = self.output_format
+        return frame_number, self.get_frame(frame_number, fmt), fmt
     
-    def _convert_colorspace(self, frame: NDArray) -> NDArray:
-        """Convert RGB24 frame to output colorspace"""
-        cs = self.output_format.colorspace
+    def _convert_frame(self, frame: av.VideoFrame, fmt: VideoFormat) -> NDArray:
+        """Scale a decoded frame and convert it to the given output format"""
+        # swscale does the resize and the pixel format conversion in one
+        # pass. Output is full-range BT.601, the same as colorspace.py.
+        converted = self._resampler.reformat(
+            frame,
+            width=fmt.width,
+            height=fmt.height,
+            format=_AV_FORMATS[fmt.colorspace],
+            dst_colorspace='ITU601',
+            dst_color_range='JPEG',
+            interpolation='LANCZOS',
+        )
         
-        if cs == ColorSpace.RGB24:
-            return frame
-        elif cs == ColorSpace.YUV422:
-            return rgb24_to_yuv422_uyvy(frame)
-        elif cs == ColorSpace.YUV420P:
-            return rgb24_to_yuv420p(frame)
-        else:
-            logger.warning(f"Unknown colorspace {cs}, returning RGB24")
-            return frame
+        if fmt.colorspace == ColorSpace.YUV420P:
+            # Planes are copied into one contiguous (height * 1.5, width) array
+            return converted.to_ndarray().ravel()
+        
+        # Packed formats: view the single plane, dropping any row padding
+        plane = converted.planes[0]
+        row_bytes = int(converted.width * fmt.colorspace.bytes_per_pixel)
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)
+        output = np.ascontiguousarray(rows[:converted.height, :row_bytes])
+        if fmt.colorspace == ColorSpace.RGB24:
+            return output.reshape(converted.height, converted.width, 3)
+        return output
     
     def advance(self) -> bool:
         """
@@ -0,0 +1,21 @@
+"""Shared test fixtures"""
+
+import av
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def numbered_video(tmp_path):
+    """30-frame clip with a keyframe every 10 frames, each frame a different grey"""
+    path = tmp_path / "numbered.mp4"
+    with av.open(str(path), 'w') as container:
+        stream = container.add_stream('mpeg4', rate=25)
+        stream.width, stream.height, stream.pix_fmt = 64, 48, 'yuv420p'
+        stream.options = {'g': '10', 'bf': '2'}
+        for n in range(30):
+            image = np.full((48, 64, 3), 8 * n, dtype=np.uint8)
+            frame = av.VideoFrame.from_ndarray(image, format='rgb24')
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode())
+    return path
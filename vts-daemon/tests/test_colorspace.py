@@ -2,9 +2,11 @@
 
 import pytest
 import numpy as np
+from vtsd import _kernels
 from vtsd.colorspace import (
     rgb24_to_yuv444,
     rgb24_to_yuv422_uyvy,
+    rgb24_to_yuv422_yuyv,
     rgb24_to_yuv420p,
     yuv422_uyvy_to_rgb24,
 )
@@ -31,6 +33,19 @@ class TestRGBtoYUV:
         assert np.allclose(u, 128, atol=2)
         assert np.allclose(v, 128, atol=2)
     
+    def test_greys_are_neutral(self):
+        """Every grey level should map to Y=level, U=V=128 and back"""
+        levels = np.arange(256, dtype=np.uint8)
+        rgb = np.repeat(levels, 3).reshape(16, 16, 3)
+        y, u, v = rgb24_to_yuv444(rgb)
+        
+        assert np.array_equal(y, rgb[:, :, 0])
+        assert np.all(u == 128)
+        assert np.all(v == 128)
+        
+        uyvy = rgb24_to_yuv422_uyvy(rgb)
+        assert np.array_equal(yuv422_uyvy_to_rgb24(uyvy, 16, 16), rgb)
+    
     def test_rgb_to_yuv422_shape(self):
         """YUV422 should be width*2 bytes per row"""
         rgb = np.zeros((480, 720, 3), dtype=np.uint8)
@@ -56,6 +71,35 @@ class TestRGBtoYUV:
 
 class TestRoundTrip:
     
+    @pytest.mark.parametrize("convert, size", [
+        (rgb24_to_yuv422_uyvy, 8 * 8 * 2),
+        (rgb24_to_yuv422_yuyv, 8 * 8 * 2),
+        (rgb24_to_yuv420p, 8 * 8 * 3 // 2),
+    ])
+    def test_convert_into_buffer(self, convert, size):
+        """Conversions should write into a caller-provided buffer"""
+        rgb = np.random.default_rng(0).integers(0, 256, (8, 8, 3), dtype=np.uint8)
+        buffer = bytearray(size)
+        
+        result = convert(rgb, out=buffer)
+        
+        assert bytes(buffer) == convert(rgb).tobytes()
+        assert np.shares_memory(result, np.frombuffer(buffer, dtype=np.uint8))
+    
+    def test_uyvy_to_rgb_into_buffer(self):
+        rgb = np.random.default_rng(0).integers(0, 256, (8, 8, 3), dtype=np.uint8)
+        uyvy = rgb24_to_yuv422_uyvy(rgb)
+        buffer = bytearray(8 * 8 * 3)
+        
+        yuv422_uyvy_to_rgb24(uyvy, 8, 8, out=buffer)
+        
+        assert bytes(buffer) == yuv422_uyvy_to_rgb24(uyvy, 8, 8).tobytes()
+    
+    def test_convert_into_wrong_size_fails(self):
+        rgb = np.zeros((8, 8, 3), dtype=np.uint8)
+        with pytest.raises(ValueError):
+            rgb24_to_yuv422_uyvy(rgb, out=bytearray(10))
+    
     def test_yuv422_roundtrip(self):
         """Converting RGB->YUV422->RGB should be close to original"""
         # Create test pattern
@@ -71,3 +115,23 @@ class TestRoundTrip:
         # Should be close but not exact due to chroma subsampling
         # Allow some tolerance
         assert np.allclose(rgb, rgb2, atol=30)
+
+
+@pytest.mark.skipif(not _kernels.HAVE_NUMBA, reason="Numba not installed")
+class TestCompiledKernels:
+    
+    @pytest.mark.parametrize("convert", [
+        rgb24_to_yuv422_uyvy,
+        rgb24_to_yuv422_yuyv,
+        rgb24_to_yuv420p,
+    ])
+    def test_matches_numpy(self, convert, monkeypatch):
+        """Compiled kernels should match the NumPy implementations"""
+        rng = np.random.default_rng(0)
+        rgb = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+        
+        compiled = convert(rgb)
+        monkeypatch.setattr(_kernels, "HAVE_NUMBA", False)
+        reference = convert(rgb)
+        
+        assert np.array_equal(compiled, reference)
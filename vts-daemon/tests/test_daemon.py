@@ -0,0 +1,383 @@
+"""Tests for the daemon's connection protocol"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from vtsd.daemon import DaemonProtocol
+from vtsd.formats import ColorSpace, VideoFormat
+from vtsd.protocol import FrameHeader, Response, format_status
+from vtsd.video_source import VideoSource
+
+
+class FakeTransport(asyncio.Transport):
+    """
+    In-memory transport that never sends anything to the client
+
+    Calls pause_writing() on the protocol once more than `high` bytes are
+    buffered, like asyncio's transports, and resume_writing() when the
+    test drains it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.protocol = None
+        self.data = bytearray()
+        self.buffered = 0
+        self.high = None
+        self.paused = False
+        self.reading = True
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        return ('127.0.0.1', 5400) if name == 'peername' else default
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        self.high = high
+
+    def write(self, data):
+        self.data += data
+        self.buffered += len(data)
+        if not self.paused and self.high is not None and self.buffered > self.high:
+            self.paused = True
+            self.protocol.pause_writing()
+
+    def writelines(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def drain(self):
+        """Let the client catch up on everything written so far"""
+        self.buffered = 0
+        if self.paused:
+            self.paused = False
+            self.protocol.resume_writing()
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def replies(self) -> list[str]:
+        """
+        Reply lines written so far, without the HELLO greeting
+
+        Frame data is skipped, and FRAMEDATA lines get the sequence number
+        and size from the frame header appended, e.g.
+        "OK FRAMEDATA 1049760 #3 720x486".
+        """
+        lines, pos = [], 0
+        while pos < len(self.data):
+            end = self.data.index(b'\n', pos)
+            line = self.data[pos:end].decode('utf-8')
+            pos = end + 1
+            if line.startswith(Response.FRAMEDATA):
+                header = FrameHeader.unpack(bytes(self.data[pos:pos + FrameHeader.SIZE]))
+                pos += FrameHeader.SIZE + int(line.split()[-1])
+                line = f"{line} #{header.sequence} {header.width}x{header.height}"
+            lines.append(line)
+        return lines[1:]
+
+
+@pytest.fixture
+def source():
+    return VideoSource(VideoFormat.ntsc())
+
+
+@pytest.fixture
+def connect(source):
+    """Connect a protocol instance for the shared source to a fake transport"""
+    def connect():
+        protocol = DaemonProtocol(source)
+        transport = FakeTransport()
+        transport.protocol = protocol
+        protocol.connection_made(transport)
+        return protocol, transport
+    return connect
+
+
+async def wait_idle(protocol: DaemonProtocol):
+    """Wait until no command is decoding, i.e. the protocol needs input or the client"""
+    async def idle():
+        while protocol._command_task:
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(idle(), timeout=5)
+
+
+def frame_reply(source: VideoSource, number: int, fmt: VideoFormat = None) -> str:
+    fmt = fmt or source.output_format
+    return f"{Response.FRAMEDATA} {fmt.frame_size_bytes} #{number} {fmt.width}x{fmt.height}"
+
+
+class TestFlowControl:
+
+    def test_pause_writing_stops_batch(self, connect, monkeypatch):
+        """Lines after the client stops reading run once it catches up"""
+        def prev_filling_buffer(self, args):
+            self.send_line("OK START")
+            self.pause_writing()
+        monkeypatch.setitem(DaemonProtocol._FAST_HANDLERS, b'PREV', prev_filling_buffer)
+
+        protocol, transport = connect()
+        protocol.data_received(b'LOOP\nPREV\nLOOP ON\nINFO\n')
+
+        assert not transport.reading
+        assert transport.replies() == ["OK LOOP OFF", "OK START"]
+        assert protocol.buffer == b'LOOP ON\nINFO\n'
+
+        protocol.resume_writing()
+
+        assert transport.reading
+        assert transport.replies()[2:] == ["OK LOOP ON", "OK INFO none"]
+        assert protocol.buffer == b''
+
+    async def test_frame_requests_stop_at_high_water_mark(
+        self, connect, source, numbered_video
+    ):
+        """Unsent frames stay within the write buffer limit"""
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME 0\n' * 6 + b'LOOP\n')
+        await wait_idle(protocol)
+
+        # The limit is four frames; with the reply lines the fourth goes over
+        assert not transport.reading
+        assert transport.replies() == [frame_reply(source, 0)] * 4
+        assert protocol.buffer == b'GETFRAME 0\nGETFRAME 0\nLOOP\n'
+
+        transport.drain()
+        await wait_idle(protocol)
+
+        assert transport.reading
+        assert transport.replies()[4:] == [frame_reply(source, 0)] * 2 + ["OK LOOP OFF"]
+
+
+class TestCommandOrder:
+
+    async def test_pipelined_replies_in_request_order(self, connect, source, numbered_video):
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME 3\nSTATUS\nGETFRAME 7\n')
+        await wait_idle(protocol)
+
+        assert transport.replies() == [
+            frame_reply(source, 3),
+            format_status('STOPPED', 3, 30),
+            frame_reply(source, 7),
+        ]
+
+    async def test_lines_during_decode_run_afterwards(self, connect, source, numbered_video):
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME 3\n')
+        protocol.data_received(b'STATUS\n')
+        assert transport.replies() == []
+
+        await wait_idle(protocol)
+
+        assert transport.replies() == [
+            frame_reply(source, 3),
+            format_status('STOPPED', 3, 30),
+        ]
+
+    async def test_bye_flushes_queued_replies(self, connect, source, numbered_video):
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME 3\nLOOP\nINFO\nBYE\nLOOP ON\n')
+        await wait_idle(protocol)
+
+        assert transport.closed
+        assert transport.replies()[:2] == [frame_reply(source, 3), "OK LOOP OFF"]
+        assert transport.replies()[2].startswith("OK INFO 64x48")
+        assert transport.replies()[3:] == ["OK BYE"]
+
+    async def test_connection_lost_cancels_command(self, connect, source, numbered_video):
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME 3\n')
+        task = protocol._command_task
+        protocol.connection_lost(None)
+
+        assert protocol._command_task is None
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def test_load_runs_off_event_loop(self, connect, source, numbered_video):
+        """LOAD replies from a worker thread, and later lines wait for it"""
+        protocol, transport = connect()
+
+        protocol.data_received(f'LOAD {numbered_video}\nSTATUS\n'.encode())
+        assert protocol._command_task is not None
+        assert transport.replies() == []
+
+        await wait_idle(protocol)
+
+        assert transport.replies() == [
+            "OK LOADED 30 frames",
+            format_status('STOPPED', 0, 30),
+        ]
+
+    async def test_seek_doesnt_wait_for_decode(self, connect, source, numbered_video):
+        """Commands on the event loop answer while another client decodes"""
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        # Another connection's decode holds the source lock on a worker thread
+        locked, release = threading.Event(), threading.Event()
+        def decode():
+            with source._lock:
+                locked.set()
+                release.wait(timeout=2)
+        worker = threading.Thread(target=decode)
+        worker.start()
+        locked.wait(timeout=5)
+        try:
+            start = time.monotonic()
+            protocol.data_received(b'SEEK 12\nSTOP\n')
+            assert time.monotonic() - start < 1
+            assert transport.replies() == ["OK SEEKED 12", "OK STOPPED"]
+        finally:
+            release.set()
+            worker.join()
+
+
+class TestSharedSource:
+
+    async def test_header_matches_converted_format(
+        self, connect, source, numbered_video, monkeypatch
+    ):
+        """A FORMAT during the decode doesn't change the frame's header"""
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        decode_frame = VideoSource._decode_frame
+        def decode_then_change_format(self, frame_number):
+            frame = decode_frame(self, frame_number)
+            self.output_format = VideoFormat.pal(ColorSpace.YUV422)
+            return frame
+        monkeypatch.setattr(VideoSource, '_decode_frame', decode_then_change_format)
+
+        protocol.data_received(b'GETFRAME 5\n')
+        await wait_idle(protocol)
+
+        assert transport.replies() == [frame_reply(source, 5, VideoFormat.ntsc())]
+
+    async def test_commands_during_load(self, connect, source, numbered_video, monkeypatch):
+        """Until LOAD finishes indexing, the source doesn't count as loaded"""
+        indexing, release = threading.Event(), threading.Event()
+        build_index = VideoSource._build_index
+        def slow_build_index(container, stream):
+            indexing.set()
+            release.wait(timeout=5)
+            return build_index(container, stream)
+        monkeypatch.setattr(VideoSource, '_build_index', staticmethod(slow_build_index))
+
+        loader, loader_transport = connect()
+        protocol, transport = connect()
+        loader.data_received(f'LOAD {numbered_video}\n'.encode())
+        try:
+            assert await asyncio.to_thread(indexing.wait, 5)
+            protocol.data_received(b'PLAY\nSEEK -1\nSTATUS\n')
+        finally:
+            release.set()
+        await wait_idle(loader)
+
+        assert transport.replies() == [
+            "ERROR 501 No file loaded",
+            "ERROR 501 No file loaded",
+            format_status('STOPPED', 0, 0),
+        ]
+        assert loader_transport.replies() == ["OK LOADED 30 frames"]
+
+    async def test_seek_during_decode_is_kept(self, connect, source, numbered_video, monkeypatch):
+        """Another client's SEEK during a decode isn't undone when it finishes"""
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        decode_frame = VideoSource._decode_frame
+        def decode_then_seek(self, frame_number):
+            frame = decode_frame(self, frame_number)
+            self.seek(2)
+            return frame
+        monkeypatch.setattr(VideoSource, '_decode_frame', decode_then_seek)
+
+        protocol.data_received(b'GETFRAME 8\nSTATUS\n')
+        await wait_idle(protocol)
+
+        assert transport.replies() == [frame_reply(source, 8), format_status('STOPPED', 2, 30)]
+
+
+class TestFastCommands:
+
+    @pytest.fixture
+    def handled(self, monkeypatch):
+        """Lines that reached handle_command()"""
+        lines = []
+        handle_command = DaemonProtocol.handle_command
+        def record(self, line):
+            lines.append(line)
+            handle_command(self, line)
+        monkeypatch.setattr(DaemonProtocol, 'handle_command', record)
+        return lines
+
+    async def test_lower_case_falls_through(self, connect, source, numbered_video, handled):
+        assert source.load(numbered_video)
+        protocol, transport = connect()
+
+        protocol.data_received(b'getframe 3\n')
+        await wait_idle(protocol)
+
+        assert handled == ['getframe 3']
+        assert transport.replies() == [frame_reply(source, 3)]
+
+    def test_crlf_line_ending(self, connect):
+        """A trailing CR is stripped, so the reply matches a plain LF line"""
+        protocol, transport = connect()
+
+        protocol.data_received(b'STATUS\r\nSTATUS\n')
+
+        assert transport.replies() == [format_status('STOPPED', 0, 0)] * 2
+
+    def test_invalid_frame_number_falls_through(self, connect, handled):
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME abc\n')
+
+        assert handled == ['GETFRAME abc']
+        assert transport.replies() == ["ERROR 401 Invalid frame number"]
+
+    def test_invalid_utf8_falls_through(self, connect, handled):
+        protocol, transport = connect()
+
+        protocol.data_received(b'GETFRAME \xff\n')
+
+        assert handled == []
+        assert transport.replies() == ["ERROR 401 Invalid UTF-8"]
+
+
+class TestList:
+
+    def test_lists_video_files(self, connect, tmp_path):
+        for name in ['A.MP4', 'b.mov', 'notes.txt', 'clip.mp4.bak']:
+            (tmp_path / name).write_bytes(b'')
+        (tmp_path / 'x.mp4').mkdir()
+        (tmp_path / 'link.mkv').symlink_to(tmp_path / 'b.mov')
+        protocol, transport = connect()
+
+        protocol.data_received(f'LIST {tmp_path}\n'.encode())
+
+        assert transport.replies() == ["OK LIST 3", "A.MP4", "b.mov", "link.mkv"]
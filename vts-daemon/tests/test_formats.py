@@ -41,6 +41,17 @@ class TestVideoFormat:
         fmt = VideoFormat.pal()
         assert fmt.frame_duration_ms == 40.0
     
+    def test_ntsc_frame_timestamp(self):
+        fmt = VideoFormat.ntsc()
+        assert fmt.frame_timestamp_ms(0) == 0
+        # 30 frames at 30000/1001 fps is exactly 1001 ms
+        assert fmt.frame_timestamp_ms(30) == 1001
+        assert fmt.frame_timestamp_ms(1000) == 33366
+    
+    def test_pal_frame_timestamp(self):
+        fmt = VideoFormat.pal()
+        assert fmt.frame_timestamp_ms(25) == 1000
+    
     def test_frame_size_rgb24(self):
         fmt = VideoFormat.ntsc(ColorSpace.RGB24)
         assert fmt.frame_size_bytes == 720 * 486 * 3
@@ -49,6 +60,10 @@ class TestVideoFormat:
         fmt = VideoFormat.ntsc(ColorSpace.YUV422)
         assert fmt.frame_size_bytes == 720 * 486 * 2
     
+    def test_data_rate(self):
+        fmt = VideoFormat.pal(ColorSpace.RGB24)
+        assert fmt.data_rate_mbps == 720 * 576 * 3 * 25 * 8 / 1_000_000
+    
     def test_format_string(self):
         fmt = VideoFormat.ntsc()
         s = str(fmt)
@@ -63,3 +78,7 @@ class TestColorSpace:
         assert ColorSpace.RGB24.bytes_per_pixel == 3.0
         assert ColorSpace.YUV422.bytes_per_pixel == 2.0
         assert ColorSpace.YUV420P.bytes_per_pixel == 1.5
+    
+    def test_every_colorspace_has_frame_size(self):
+        for colorspace in ColorSpace:
+            assert VideoFormat.ntsc(colorspace).frame_size_bytes > 0
@@ -35,6 +35,26 @@ class TestFrameHeader:
         assert unpacked.colorspace == 0
         assert unpacked.flags == FrameFlags.KEYFRAME
     
+    def test_pack_into_matches_pack(self):
+        """pack_into should write the same bytes as pack at the given offset"""
+        header = FrameHeader(7, 233, 720, 576, 1, FrameFlags.KEYFRAME)
+        
+        buffer = bytearray(4 + FrameHeader.SIZE)
+        header.pack_into(buffer, 4)
+        
+        assert buffer[:4] == bytes(4)
+        assert bytes(buffer[4:]) == header.pack()
+    
+    def test_pack_values_matches_pack(self):
+        header = FrameHeader(7, 233, 720, 576, 1, FrameFlags.KEYFRAME)
+        packed = FrameHeader.pack_values(7, 233, 720, 576, 1, FrameFlags.KEYFRAME)
+        assert packed == header.pack()
+    
+    def test_header_is_immutable(self):
+        header = FrameHeader(0, 0, 720, 486, 0, 0)
+        with pytest.raises(AttributeError):
+            header.sequence = 1
+    
     def test_is_keyframe(self):
         header = FrameHeader(0, 0, 720, 486, 0, FrameFlags.KEYFRAME)
         assert header.is_keyframe
@@ -73,6 +93,15 @@ class TestParseCommand:
         assert cmd == "FORMAT"
         assert args == ["NTSC", "RGB24"]
     
+    def test_unterminated_quote(self):
+        cmd, args = parse_command('LOAD "/path/with spaces/video.mp4')
+        assert cmd == "LOAD"
+        assert args == ["/path/with spaces/video.mp4"]
+    
+    def test_quoted_and_plain_args(self):
+        cmd, args = parse_command('LOAD "my clip.mp4" 10  "" x')
+        assert args == ["my clip.mp4", "10", "", "x"]
+    
     def test_empty_line(self):
         cmd, args = parse_command("")
         assert cmd == ""
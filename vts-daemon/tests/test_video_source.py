@@ -0,0 +1,130 @@
+"""Tests for video source helpers"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import av
+import numpy as np
+
+from vtsd.formats import VideoFormat, ColorSpace
+from vtsd.video_source import FrameCache, VideoSource
+
+
+class TestFrameCache:
+    
+    def test_get_missing(self):
+        cache = FrameCache(max_size=2)
+        assert cache.get(0) is None
+    
+    def test_evicts_least_recently_used(self):
+        cache = FrameCache(max_size=2)
+        cache.put(0, 'a')
+        cache.put(1, 'b')
+        cache.get(0)
+        cache.put(2, 'c')
+        
+        assert len(cache) == 2
+        assert cache.get(0) == 'a'
+        assert cache.get(1) is None
+        assert cache.get(2) == 'c'
+    
+    def test_format_keys_are_distinct(self):
+        """Frames cached for one output format are not served for another"""
+        cache = FrameCache()
+        cache.put((5, VideoFormat.ntsc()), 'rgb')
+        
+        assert cache.get((5, VideoFormat.ntsc())) == 'rgb'
+        assert cache.get((5, VideoFormat.ntsc(ColorSpace.YUV422))) is None
+        assert cache.get((5, VideoFormat.pal())) is None
+
+
+class TestVideoSource:
+    
+    def test_seek_returns_requested_frame(self, numbered_video):
+        """Seeking lands on the requested frame, not the keyframe before it"""
+        source = VideoSource(VideoFormat.ntsc(), cache_size=1, decoded_cache_size=1)
+        assert source.load(numbered_video)
+        assert source.total_frames == 30
+        
+        # Reference: every frame decoded in order, converted the same way
+        fmt = source.output_format
+        with av.open(str(numbered_video)) as container:
+            expected = [source._convert_frame(f, fmt) for f in container.decode(video=0)]
+        
+        for n in [17, 3, 29, 10, 11, 25, 0, 9]:
+            number, frame, _ = source.read_frame(n)
+            assert number == n
+            assert np.array_equal(frame, expected[n])
+    
+    def test_cached_frame_served_while_source_busy(self, numbered_video):
+        """Cache hits don't wait for the source lock held by a decode"""
+        source = VideoSource(VideoFormat.ntsc())
+        assert source.load(numbered_video)
+        expected = source.get_frame(3)
+        
+        with ThreadPoolExecutor(max_workers=1) as pool, source._lock:
+            assert pool.submit(source.get_frame, 3).result(timeout=5) is expected
+    
+    def test_seek_without_keyframes_in_index(self, numbered_video, monkeypatch):
+        """Frames are still served when no packet is flagged as a keyframe"""
+        build_index = VideoSource._build_index
+        def build_index_without_keyframes(container, stream):
+            return build_index(container, stream)[0], []
+        monkeypatch.setattr(VideoSource, '_build_index', staticmethod(build_index_without_keyframes))
+        source = VideoSource(VideoFormat.ntsc(), cache_size=1, decoded_cache_size=1)
+        assert source.load(numbered_video)
+        
+        fmt = source.output_format
+        with av.open(str(numbered_video)) as container:
+            expected = [source._convert_frame(f, fmt) for f in container.decode(video=0)]
+        
+        # A seek by time may land past the frame, but never fails
+        for n in [17, 3, 29]:
+            number, frame, _ = source.read_frame(n)
+            assert number == n
+            assert frame is not None
+        
+        # Decoding forward from a seek is exact
+        for n in range(5):
+            number, frame, _ = source.read_frame(n)
+            assert np.array_equal(frame, expected[n])
+    
+    def test_frame_count_after_failed_index(self, tmp_path, monkeypatch):
+        """Counting frames starts over from the beginning of the file"""
+        # Raw MPEG-2 video has no frame count or duration in its headers
+        path = tmp_path / "clip.m2v"
+        with av.open(str(path), 'w', format='mpeg2video') as container:
+            stream = container.add_stream('mpeg2video', rate=25)
+            stream.width, stream.height, stream.pix_fmt = 64, 48, 'yuv420p'
+            for n in range(30):
+                image = np.full((48, 64, 3), 8 * n, dtype=np.uint8)
+                container.mux(stream.encode(av.VideoFrame.from_ndarray(image, format='rgb24')))
+            container.mux(stream.encode())
+        
+        # Indexing reads to the end before finding a packet without a timestamp
+        def build_index(container, stream):
+            for _ in container.demux(stream):
+                pass
+            return [], []
+        monkeypatch.setattr(VideoSource, '_build_index', staticmethod(build_index))
+        
+        source = VideoSource(VideoFormat.ntsc())
+        assert source.load(path)
+        assert source.total_frames == 30
+    
+    def test_format_change_during_decode(self, numbered_video, monkeypatch):
+        """A frame is converted to the format it was requested in"""
+        source = VideoSource(VideoFormat.ntsc())
+        assert source.load(numbered_video)
+        
+        # Another client sends FORMAT while the frame decodes
+        decode_frame = VideoSource._decode_frame
+        def decode_then_change_format(self, frame_number):
+            frame = decode_frame(self, frame_number)
+            self.output_format = VideoFormat.pal(ColorSpace.YUV422)
+            return frame
+        monkeypatch.setattr(VideoSource, '_decode_frame', decode_then_change_format)
+        
+        assert source.get_frame(5).shape == (486, 720, 3)
+        
+        source.output_format = VideoFormat.ntsc()
+        assert source.get_frame(5).shape == (486, 720, 3)